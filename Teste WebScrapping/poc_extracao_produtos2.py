@@ -1,6 +1,8 @@
 import time
 import re
 import os
+import json
+import hashlib
 from datetime import datetime
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
@@ -18,6 +20,16 @@ SELECTOR_PRECO = ".font-bold"
 
 SELECTOR_FECHAR_MODAL_OU_AVISO = "button.close, .close-button, [aria-label='Fechar'], .modal-fechar, .fechar-aviso-cookie"
 
+# Agendamento por taxa de alteração
+ARQUIVO_HISTORICO = "historico_alteracoes.json"
+ORCAMENTO_TEMPO_SEGUNDOS = None     # None = crawl completo; ex.: 600 = no máximo ~10 minutos
+ALFA_TAXA_ALTERACAO = 0.3           # Peso da execução mais recente na taxa de alteração (média móvel)
+TAXA_ALTERACAO_INICIAL = 0.5        # Taxa assumida antes da primeira comparação
+LIMIAR_PROB_ALTERACAO_PAGINA = 0.2  # Abaixo disso a página é considerada estável e pulada nesta execução
+MAX_EXECUCOES_SEM_VISITA = 7        # Força revisita de itens estáveis depois de N execuções
+SEGUNDOS_POR_PAGINA_PADRAO = 8.0    # Estimativa de custo para departamentos sem histórico
+PAGINAS_PADRAO = 5
+
 
 ###################################################################################
 #  FUNÇÕES UTILITÁRIAS 
@@ -42,6 +54,230 @@ def trata_campo_descricao(descricao: str) -> str:
     descricao_tratada: str = descricao.replace('  ', ' ').strip()
     return descricao_tratada
 
+TIPOS_CAMPOS_HISTORICO = {
+    'taxa': (int, float),
+    'segundos_por_pagina': (int, float),
+    'visitas': int,
+    'ultima_execucao': int,
+    'paginas_conhecidas': int,
+    'fim_suspeito': int,
+    'assinatura': str,
+    'produtos': list,
+}
+
+def assinatura_produtos(produtos: list) -> str:
+    """Gera um hash estável do conjunto (descrição, preço) de uma página."""
+    itens = sorted(f"{p['descricao']}|{p['preco']}" for p in produtos)
+    return hashlib.sha1("\n".join(itens).encode('utf-8')).hexdigest()
+
+###################################################################################
+#  AGENDADOR DE CRAWL (TAXA DE ALTERAÇÃO)
+###################################################################################
+
+class AgendadorCrawl:
+    """Mantém estatísticas de alteração por departamento/página entre execuções e decide
+    o que coletar, e em que ordem, dentro de um orçamento de tempo."""
+
+    def __init__(self, caminho_historico: str, logger_func, orcamento_segundos=None):
+        self.caminho_historico = caminho_historico
+        self.logger = logger_func
+        self.orcamento_segundos = orcamento_segundos
+        self.historico = self._carregar()
+        self.execucao_atual = self.historico.get('execucoes', 0) + 1
+        self._alteracoes_departamento = {}
+        self._atrasado_liberado = False
+        self.departamentos_adiados = 0
+        self.paginas_reaproveitadas = 0
+        self.produtos_reaproveitados = 0
+
+    def _carregar(self) -> dict:
+        try:
+            with open(self.caminho_historico, 'r', encoding='utf-8') as f:
+                historico = json.load(f)
+        except FileNotFoundError:
+            return {'execucoes': 0, 'departamentos': {}}
+        except (OSError, ValueError) as err:
+            self.logger(f"   [AGENDA-ERRO] Histórico ilegível, iniciando do zero: {err}")
+            return {'execucoes': 0, 'departamentos': {}}
+
+        if (not isinstance(historico, dict) or not isinstance(historico.get('departamentos'), dict)
+                or not isinstance(historico.get('execucoes', 0), int)):
+            self.logger("   [AGENDA-ERRO] Histórico com formato inesperado, iniciando do zero.")
+            return {'execucoes': 0, 'departamentos': {}}
+        departamentos = {}
+        for link, registro in historico['departamentos'].items():
+            if self._registro_valido(registro, ('paginas',)) and isinstance(registro['paginas'], dict):
+                registro['paginas'] = {
+                    pagina: registro_pagina for pagina, registro_pagina in registro['paginas'].items()
+                    if pagina.isdigit() and self._registro_valido(registro_pagina, ('taxa', 'visitas'))
+                }
+                departamentos[link] = registro
+        descartados = len(historico['departamentos']) - len(departamentos)
+        if descartados:
+            self.logger(f"   [AGENDA-ERRO] {descartados} departamento(s) com histórico inválido descartado(s).")
+        historico['departamentos'] = departamentos
+        return historico
+
+    @staticmethod
+    def _registro_valido(registro, campos_obrigatorios: tuple) -> bool:
+        """Confere os tipos dos campos conhecidos de um registro de departamento/página."""
+        if not isinstance(registro, dict) or any(campo not in registro for campo in campos_obrigatorios):
+            return False
+        if 'ultima_execucao' in registro and 'taxa' not in registro:
+            return False
+        for campo, tipo in TIPOS_CAMPOS_HISTORICO.items():
+            if campo in registro and (isinstance(registro[campo], bool) or not isinstance(registro[campo], tipo)):
+                return False
+        return all(
+            isinstance(produto, dict) and isinstance(produto.get('descricao'), str) and isinstance(produto.get('preco'), str)
+            for produto in registro.get('produtos', [])
+        )
+
+    def salvar(self):
+        """Grava o histórico de forma atômica (arquivo temporário + replace)."""
+        self.historico['execucoes'] = self.execucao_atual
+        caminho_tmp = f"{self.caminho_historico}.tmp"
+        try:
+            with open(caminho_tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.historico, f, ensure_ascii=False, indent=2)
+            os.replace(caminho_tmp, self.caminho_historico)
+        except OSError as err:
+            self.logger(f"   [AGENDA-ERRO] Não foi possível salvar o histórico: {err}")
+
+    def _probabilidade_alteracao(self, registro) -> float:
+        """Probabilidade de ter mudado desde a última visita: 1 - (1 - taxa) ^ execuções_sem_visita."""
+        if not registro or 'ultima_execucao' not in registro:
+            return 1.0
+        execucoes_sem_visita = self.execucao_atual - registro['ultima_execucao']
+        if execucoes_sem_visita >= MAX_EXECUCOES_SEM_VISITA:
+            return 1.0
+        return 1.0 - (1.0 - registro['taxa']) ** execucoes_sem_visita
+
+    def _atrasado(self, link: str) -> bool:
+        """Sem histórico ou sem visita há MAX_EXECUCOES_SEM_VISITA execuções."""
+        registro = self.historico['departamentos'].get(link)
+        if not registro or 'ultima_execucao' not in registro:
+            return True
+        return self.execucao_atual - registro['ultima_execucao'] >= MAX_EXECUCOES_SEM_VISITA
+
+    def _departamento(self, link: str) -> dict:
+        return self.historico['departamentos'].setdefault(link, {'paginas': {}})
+
+    def paginas_conhecidas(self, link: str) -> int:
+        return self.historico['departamentos'].get(link, {}).get('paginas_conhecidas', 0)
+
+    def produtos_ultima_coleta(self, link: str, pagina: int) -> list:
+        """Produtos gravados na última visita da página (usados quando ela é pulada)."""
+        return self.historico['departamentos'][link]['paginas'][str(pagina)]['produtos']
+
+    def paginas_a_pular(self, link: str) -> set:
+        """Páginas estáveis que podem ser puladas. Só atua com orçamento definido e nunca
+        pula a última página conhecida, que garante a detecção do fim da paginação.
+        Só são puladas páginas com produtos gravados, que são reaproveitados na saída."""
+        if self.orcamento_segundos is None:
+            return set()
+        registro = self.historico['departamentos'].get(link)
+        if not registro:
+            return set()
+        paginas_a_pular = set()
+        for pagina in range(1, self.paginas_conhecidas(link)):
+            registro_pagina = registro['paginas'].get(str(pagina))
+            if (registro_pagina and 'produtos' in registro_pagina
+                    and self._probabilidade_alteracao(registro_pagina) < LIMIAR_PROB_ALTERACAO_PAGINA):
+                paginas_a_pular.add(pagina)
+        return paginas_a_pular
+
+    def custo_estimado(self, link: str) -> float:
+        """Tempo estimado (s) para coletar o departamento, considerando as páginas puladas."""
+        registro = self.historico['departamentos'].get(link, {})
+        paginas = registro.get('paginas_conhecidas', PAGINAS_PADRAO) + 1  # +1: página que detecta o fim
+        segundos_por_pagina = registro.get('segundos_por_pagina', SEGUNDOS_POR_PAGINA_PADRAO)
+        return max(paginas - len(self.paginas_a_pular(link)), 1) * max(segundos_por_pagina, 0.1)
+
+    def planejar_departamentos(self, links_departamentos: list) -> list:
+        """Ordena os departamentos pela probabilidade de alteração por segundo de coleta.
+        Departamentos sem histórico vêm primeiro; os estáveis ficam para o fim (amostrados)."""
+        def prioridade(link):
+            registro = self.historico['departamentos'].get(link)
+            sem_historico = not registro or 'ultima_execucao' not in registro
+            return sem_historico, self._probabilidade_alteracao(registro) / self.custo_estimado(link)
+
+        plano = sorted(links_departamentos, key=prioridade, reverse=True)
+        self.logger(f"🗓️ Execução #{self.execucao_atual} | Orçamento: "
+                    f"{'completo' if self.orcamento_segundos is None else f'{self.orcamento_segundos}s'}")
+        for link in plano:
+            registro = self.historico['departamentos'].get(link)
+            self.logger(f"   [AGENDA] {link.ljust(45)} | P(alteração): {self._probabilidade_alteracao(registro):.2f}"
+                        f" | Custo estimado: {self.custo_estimado(link):.0f}s")
+        return plano
+
+    def cabe_no_orcamento(self, link: str, segundos_decorridos: float) -> bool:
+        """Verifica se o departamento cabe no tempo restante. Por execução, enquanto ainda houver
+        orçamento, um departamento atrasado pode ultrapassá-lo, para que departamentos grandes
+        não sejam adiados para sempre."""
+        if self.orcamento_segundos is None:
+            return True
+        if segundos_decorridos + self.custo_estimado(link) <= self.orcamento_segundos:
+            return True
+        if (not self._atrasado_liberado and segundos_decorridos < self.orcamento_segundos
+                and self._atrasado(link)):
+            self._atrasado_liberado = True
+            registro = self.historico['departamentos'].get(link)
+            if not registro or 'ultima_execucao' not in registro:
+                self.logger(f"\n[AGENDA] {link} sem histórico. Coletando fora do orçamento.")
+            else:
+                self.logger(f"\n[AGENDA] {link} sem visita há {MAX_EXECUCOES_SEM_VISITA} execuções ou mais. "
+                            "Coletando fora do orçamento.")
+            return True
+        self.departamentos_adiados += 1
+        return False
+
+    def registrar_pagina(self, link: str, pagina: int, produtos: list):
+        """Compara a assinatura da página com a anterior e atualiza a taxa de alteração."""
+        paginas = self._departamento(link)['paginas']
+        registro = paginas.setdefault(str(pagina), {'taxa': TAXA_ALTERACAO_INICIAL, 'visitas': 0})
+        assinatura = assinatura_produtos(produtos)
+        alterou = registro.get('assinatura') != assinatura
+        if 'assinatura' in registro:
+            registro['taxa'] = ALFA_TAXA_ALTERACAO * alterou + (1 - ALFA_TAXA_ALTERACAO) * registro['taxa']
+        registro['assinatura'] = assinatura
+        registro['produtos'] = produtos
+        registro['visitas'] += 1
+        registro['ultima_execucao'] = self.execucao_atual
+        if alterou:
+            self._alteracoes_departamento[link] = True
+
+    def registrar_departamento(self, link: str, fim_paginacao: int, paginas_visitadas: int, duracao: float,
+                               fim_normal: bool = True, paginas_reaproveitadas: int = 0,
+                               produtos_reaproveitados: int = 0):
+        """Atualiza taxa de alteração, tamanho e custo por página do departamento.
+        Um fim de paginação não confirmado (falha de carregamento antes da última página
+        conhecida) só reduz o tamanho se se repetir na execução seguinte."""
+        registro = self._departamento(link)
+        alterou = self._alteracoes_departamento.pop(link, False)
+        if not fim_normal and registro.get('fim_suspeito') == fim_paginacao:
+            fim_normal = True
+        if fim_normal:
+            registro.pop('fim_suspeito', None)
+            alterou = alterou or registro.get('paginas_conhecidas') != fim_paginacao
+            registro['paginas_conhecidas'] = fim_paginacao
+            if paginas_visitadas:
+                registro['segundos_por_pagina'] = round(duracao / paginas_visitadas, 2)
+            for pagina in [p for p in registro['paginas'] if int(p) > fim_paginacao]:
+                del registro['paginas'][pagina]
+        else:
+            registro['fim_suspeito'] = fim_paginacao
+            self.logger(f"   [AGENDA] Fim da paginação na página {fim_paginacao + 1} não confirmado. "
+                        f"Mantendo {registro.get('paginas_conhecidas', 0)} páginas conhecidas.")
+        if 'ultima_execucao' in registro:
+            registro['taxa'] = ALFA_TAXA_ALTERACAO * alterou + (1 - ALFA_TAXA_ALTERACAO) * registro['taxa']
+        else:
+            registro['taxa'] = TAXA_ALTERACAO_INICIAL
+        registro['visitas'] = registro.get('visitas', 0) + 1
+        registro['ultima_execucao'] = self.execucao_atual
+        self.paginas_reaproveitadas += paginas_reaproveitadas
+        self.produtos_reaproveitados += produtos_reaproveitados
+
 ###################################################################################
 #  CLASSE DE EXTRAÇÃO 
 ###################################################################################
@@ -178,12 +414,37 @@ class PocPesquisaOtimizada:
         return produtos_encontrados
 
 
-    def controla_paginacao_url(self, url_departamento: str) -> list:
-        """Coleta produtos de todas as páginas de um departamento, navegando por URL (?page=X)."""
+    def controla_paginacao_url(self, url_departamento: str, agendador=None) -> list:
+        """Coleta produtos de todas as páginas de um departamento, navegando por URL (?page=X).
+        Com um agendador, reaproveita os produtos da última coleta nas páginas estáveis e
+        registra as alterações de cada página."""
         pagina_atual = 1
-        produtos_coletados = []
+        paginas_visitadas = 0
+        produtos_por_pagina = {}
+        paginas_reaproveitadas = set()
+        paginas_a_pular = agendador.paginas_a_pular(url_departamento) if agendador else set()
+        paginas_conhecidas = agendador.paginas_conhecidas(url_departamento) if agendador else 0
+        fim_normal = True
+        pagina_com_retentativa = None
+        revalidou = False
+        inicio = time.monotonic()
 
         while True:
+            if pagina_atual in produtos_por_pagina and pagina_atual not in paginas_reaproveitadas:
+                pagina_atual += 1
+                continue
+
+            if pagina_atual in paginas_a_pular:
+                produtos_pagina_atual = agendador.produtos_ultima_coleta(url_departamento, pagina_atual)
+                self.logger(f"\n   [AGENDA] Página {pagina_atual} estável. "
+                            f"Reaproveitando {len(produtos_pagina_atual)} produtos da última coleta.")
+                for produto in produtos_pagina_atual:
+                    self.logger(f"   ♻️ PRODUTO: {produto['descricao'][:80].ljust(80)} | Preço: R$ {produto['preco']}")
+                produtos_por_pagina[pagina_atual] = produtos_pagina_atual
+                paginas_reaproveitadas.add(pagina_atual)
+                pagina_atual += 1
+                continue
+
             url_navegacao = f"{URL_BASE}{url_departamento}"
             if pagina_atual > 1:
                 url_navegacao = f"{url_navegacao}?page={pagina_atual}"
@@ -191,25 +452,60 @@ class PocPesquisaOtimizada:
             self.logger(f"\n   [NAVEGACAO] Acessando Página: {pagina_atual} | URL: {url_navegacao}")
 
             self.navegador.get(url_navegacao)
+            paginas_visitadas += 1
             pausa(0.5) 
 
-            if not self.aguarda_pagina_produtos_carregar():
+            carregou = self.aguarda_pagina_produtos_carregar()
+            produtos_pagina_atual = self._extrair_dados_pagina_atual() if carregou else []
+
+            if not carregou or (not produtos_pagina_atual and pagina_atual > 1):
+                if pagina_atual <= paginas_conhecidas:
+                    if not carregou and pagina_com_retentativa != pagina_atual:
+                        self.logger("   [PAG-RETRY] Falha ao carregar página conhecida. Tentando novamente.")
+                        pagina_com_retentativa = pagina_atual
+                        continue
+                    # Fim antes da última página conhecida: as páginas puladas não foram verificadas
+                    if paginas_reaproveitadas and not revalidou:
+                        self.logger("   [AGENDA] Fim antes da última página conhecida. Revalidando páginas puladas.")
+                        revalidou = True
+                        paginas_a_pular = set()
+                        pagina_atual = min(paginas_reaproveitadas)
+                        continue
+                    fim_normal = carregou
+
                 if pagina_atual == 1:
                     self.logger("   [PAG-FIM] Nenhum produto carregado na primeira página. Pulando departamento.")
-                    break
-                else:
+                elif not carregou:
                     self.logger("   [PAG-FIM] Falha ao carregar produtos na página seguinte. Assumindo fim da paginação.")
-                    break
-            
-            produtos_pagina_atual = self._extrair_dados_pagina_atual()
-            
-            if not produtos_pagina_atual and pagina_atual > 1:
-                self.logger("   [PAG-FIM] Página acessada, mas vazia. Fim da paginação.")
+                else:
+                    self.logger("   [PAG-FIM] Página acessada, mas vazia. Fim da paginação.")
                 break
 
-            produtos_coletados.extend(produtos_pagina_atual)
+            if agendador:
+                agendador.registrar_pagina(url_departamento, pagina_atual, produtos_pagina_atual)
+
+            produtos_por_pagina[pagina_atual] = produtos_pagina_atual
+            paginas_reaproveitadas.discard(pagina_atual)
             
             pagina_atual += 1
+
+        fim_paginacao = pagina_atual - 1
+        if carregou:
+            # Página vazia confirmada: o que vinha depois dela não existe mais
+            for pagina in [p for p in produtos_por_pagina if p > fim_paginacao]:
+                del produtos_por_pagina[pagina]
+                paginas_reaproveitadas.discard(pagina)
+
+        produtos_coletados = [produto for pagina in sorted(produtos_por_pagina) for produto in produtos_por_pagina[pagina]]
+
+        if agendador:
+            produtos_reaproveitados = sum(len(produtos_por_pagina[pagina]) for pagina in paginas_reaproveitadas)
+            if paginas_reaproveitadas:
+                self.logger(f"\n   [AGENDA] {len(paginas_reaproveitadas)} página(s) pulada(s) nesta execução. "
+                            f"{produtos_reaproveitados} produtos reaproveitados da última coleta.")
+            agendador.registrar_departamento(url_departamento, fim_paginacao, paginas_visitadas,
+                                             time.monotonic() - inicio, fim_normal,
+                                             len(paginas_reaproveitadas), produtos_reaproveitados)
             
         return produtos_coletados
 
@@ -229,6 +525,7 @@ def inicializar_teste():
 
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     log_file_path = os.path.join(extracao_dir, f"Extracao_{timestamp}.txt")
+    historico_path = os.path.join(extracao_dir, ARQUIVO_HISTORICO)
     
     contador_produtos_final = 0
 
@@ -247,6 +544,7 @@ def inicializar_teste():
     log_to_file(f"=======================================================")
 
     navegador = None
+    agendador = None
     todos_os_produtos = []
     
     try:
@@ -280,7 +578,15 @@ def inicializar_teste():
             log_to_file("\n[FLUXO-ERRO] Nenhum link de departamento encontrado. Encerrando.", is_flow_message=True)
             return
 
+        agendador = AgendadorCrawl(historico_path, log_to_file, ORCAMENTO_TEMPO_SEGUNDOS)
+        links_departamentos = agendador.planejar_departamentos(links_departamentos)
+        inicio_coleta = time.monotonic()
+
         for link_departamento in links_departamentos:
+
+            if not agendador.cabe_no_orcamento(link_departamento, time.monotonic() - inicio_coleta):
+                log_to_file(f"\n[AGENDA] Orçamento insuficiente para {link_departamento}. Ficará para a próxima execução.")
+                continue
             
             nome_departamento = link_departamento.split('/')[-1].replace('-', ' ').upper()
             
@@ -288,7 +594,8 @@ def inicializar_teste():
             log_to_file(f">>> INICIANDO DEPTO: {nome_departamento} | Link: {link_departamento} <<<")
             log_to_file(f"=======================================================")
             
-            produtos_departamento = poc.controla_paginacao_url(link_departamento)
+            produtos_departamento = poc.controla_paginacao_url(link_departamento, agendador)
+            agendador.salvar()
             
             todos_os_produtos.extend(produtos_departamento)
             contador_produtos_final = len(todos_os_produtos)
@@ -302,9 +609,18 @@ def inicializar_teste():
     finally:
         if navegador:
             navegador.quit()
+
+        if agendador:
+            agendador.salvar()
         
         log_to_file("\n\n#######################################################", is_flow_message=True)
         log_to_file(f"PROCESSO FINALIZADO. TOTAL GERAL DE PRODUTOS: {contador_produtos_final}", is_flow_message=True)
+        if agendador and agendador.orcamento_segundos is not None:
+            log_to_file(f"COLETA PARCIAL (ORÇAMENTO DE {agendador.orcamento_segundos}s): "
+                        f"{agendador.departamentos_adiados} departamento(s) adiado(s), "
+                        f"{agendador.paginas_reaproveitadas} página(s) pulada(s) com "
+                        f"{agendador.produtos_reaproveitados} produto(s) reaproveitado(s) da última coleta.",
+                        is_flow_message=True)
         log_to_file("#######################################################", is_flow_message=True)
 
 if __name__ == '__main__':